@@ -1,6 +1,6 @@
 # frontend/app.py
 import streamlit as st
-import sys, os
+import sys, os, hashlib
 from pathlib import Path
 import pandas as pd
 
@@ -15,6 +15,62 @@ from ml.anomalies import flag_amount_anomalies, flag_missed_cycles
 from ml.score_subs import SubscriptionScorer
 from ml.train_subs_models import train_from_transactions
 
+# ---------- Cached pipeline steps ----------
+# Streamlit reruns this whole script on every widget change; each step below is
+# keyed on the uploaded file's hash so only the branch that changed is recomputed.
+# Leading-underscore args are excluded from Streamlit's cache key.
+
+@st.cache_data(show_spinner=False)
+def cached_extract_text(file_hash: str, ext: str, _data: bytes) -> str:
+    os.makedirs("data", exist_ok=True)
+    temp_path = Path("data") / f"temp{ext}"
+    with open(temp_path, "wb") as f:
+        f.write(_data)
+    return extract_text_from_file(str(temp_path)) or ""
+
+@st.cache_data(show_spinner=False)
+def cached_transactions(raw_text: str) -> pd.DataFrame:
+    tx = parse_text_to_transactions(raw_text)
+    return resolve_merchants(tx) if not tx.empty else tx
+
+@st.cache_resource(show_spinner=False)
+def load_scorer(model_path: str, model_mtime: float, meta_path: str, threshold: float) -> SubscriptionScorer:
+    # One unpickled model per process (and per model file version), shared across reruns
+    return SubscriptionScorer(model_path, meta_path=meta_path, threshold=threshold)
+
+META_PATH = "models/subs_meta.json"
+# Scorer settings: meta alignment + higher threshold for precision
+RF_THRESHOLD, XGB_THRESHOLD = 1, 0.65
+
+def pick_scorer(pref: str, rf_path: str, xgb_path: str):
+    """Return (model_path, threshold, mode) for the one model to load, or None for heuristics."""
+    if pref == "Heuristic only":
+        return None
+    has_rf, has_xgb = os.path.exists(rf_path), os.path.exists(xgb_path)
+    if pref in {"Auto (prefer XGBoost)", "XGBoost"} and has_xgb:
+        return xgb_path, XGB_THRESHOLD, "xgboost"
+    if pref == "RandomForest" and has_rf:
+        return rf_path, RF_THRESHOLD, "random_forest"
+    if has_xgb:
+        return xgb_path, XGB_THRESHOLD, "xgboost"
+    if has_rf:
+        return rf_path, RF_THRESHOLD, "random_forest"
+    return None
+
+@st.cache_data(show_spinner=False)
+def cached_ml_subs(file_hash: str, model_path: str, model_mtime: float, meta_path: str, threshold: float, _tx: pd.DataFrame) -> pd.DataFrame:
+    # model_mtime keys the cache on the model file version, so retrained models are picked up
+    scorer = load_scorer(model_path, model_mtime, meta_path, threshold)
+    return scorer.score(_tx)[["merchant_norm","brand","category","prob","is_subscription","count","mean_amt"]]
+
+@st.cache_data(show_spinner=False)
+def cached_heuristic_subs(file_hash: str, _tx: pd.DataFrame) -> pd.DataFrame:
+    return flag_missed_cycles(detect_recurring_subscriptions(_tx))
+
+@st.cache_data(show_spinner=False)
+def cached_anomalies(file_hash: str, _tx: pd.DataFrame) -> pd.DataFrame:
+    return flag_amount_anomalies(_tx)
+
 st.set_page_config(page_title="SubTrackr", layout="wide")
 st.sidebar.title("SubTrackr")
 st.sidebar.markdown("Dashboard")
@@ -34,60 +90,38 @@ uploaded_file = st.file_uploader("Upload Bank Statements (PDF, JPG, PNG)", type=
 PREFERRED_MODEL = st.selectbox("Detection engine", ["Auto (prefer XGBoost)", "RandomForest", "XGBoost", "Heuristic only"], index=0)
 
 if uploaded_file:
-    os.makedirs("data", exist_ok=True)
     ext = Path(uploaded_file.name).suffix.lower()
-    temp_path = Path("data") / f"temp{ext}"
-    with open(temp_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    file_bytes = bytes(uploaded_file.getbuffer())
+    file_hash = hashlib.sha1(file_bytes).hexdigest()
 
     st.info(f"Processing: {uploaded_file.name}")
-    raw_text = extract_text_from_file(str(temp_path)) or ""
+    raw_text = cached_extract_text(file_hash, ext, file_bytes)
 
     print(f"Raw text ----->{raw_text}")
 
-    tx = parse_text_to_transactions(raw_text)
+    # Parse + resolve merchants (NLP)
+    tx = cached_transactions(raw_text)
     if tx.empty:
         st.error("No transactions parsed from this file.")
         st.stop()
 
-    # Resolve merchants (NLP)
-    tx = resolve_merchants(tx)
-
     # ---------- Primary detection: ML if available (as requested) ----------
     rf_path, xgb_path = "models/rf_subscription.pkl", "models/xgb_subscription.pkl"
     used_mode = "heuristic"
     subs_ml = None
 
-    if PREFERRED_MODEL != "Heuristic only" and (os.path.exists("models/rf_subscription.pkl") or os.path.exists("models/xgb_subscription.pkl")):
+    picked = pick_scorer(PREFERRED_MODEL, rf_path, xgb_path)
+    if picked is not None:
         try:
-            # Model paths
-            rf_path = "models/rf_subscription.pkl"
-            xgb_path = "models/xgb_subscription.pkl"
-            meta_path = "models/subs_meta.json"
-
-            # Initialize both scorers with meta alignment + higher threshold for precision
-            rf_scorer = SubscriptionScorer(rf_path, meta_path=meta_path, threshold=1)
-            xgb_scorer = SubscriptionScorer(xgb_path, meta_path=meta_path, threshold=0.65)
-
-            # Model selection logic
-            if PREFERRED_MODEL in {"Auto (prefer XGBoost)", "XGBoost"} and os.path.exists(xgb_path):
-                scorer, used_mode = xgb_scorer, "xgboost"
-            elif PREFERRED_MODEL == "RandomForest" and os.path.exists(rf_path):
-                scorer, used_mode = rf_scorer, "random_forest"
-            elif os.path.exists(xgb_path):
-                scorer, used_mode = xgb_scorer, "xgboost"
-            else:
-                scorer, used_mode = rf_scorer, "random_forest"
-
-            subs_ml = scorer.score(tx)[["merchant_norm","brand","category","prob","is_subscription","count","mean_amt"]]
+            model_path, threshold, used_mode = picked
+            subs_ml = cached_ml_subs(file_hash, model_path, os.path.getmtime(model_path), META_PATH, threshold, tx)
 
         except Exception as e:
             st.warning(f"Model scoring unavailable ({e}). Falling back to heuristics.")
             subs_ml = None
 
     # ---------- Heuristic fallback (always available) ----------
-    subs_heur = detect_recurring_subscriptions(tx)
-    subs_heur = flag_missed_cycles(subs_heur)
+    subs_heur = cached_heuristic_subs(file_hash, tx)
 
     # ---------- Decide what to show as the "main" subscriptions ----------
     if subs_ml is not None:
@@ -133,7 +167,7 @@ if uploaded_file:
     st.dataframe(view, use_container_width=True)
 
     # Anomalies (amount spikes)
-    tx_flagged = flag_amount_anomalies(tx)
+    tx_flagged = cached_anomalies(file_hash, tx)
     st.subheader("Transaction Anomalies (amount spikes)")
     st.dataframe(tx_flagged[["date","description","amount","merchant_norm","brand","category","amount_anomaly"]], use_container_width=True)
 
@@ -142,6 +176,7 @@ if uploaded_file:
         if st.button("Train RF & XGB (no metrics in UI)"):
             try:
                 train_from_transactions(tx, out_dir="models")
+                cached_ml_subs.clear()
                 st.success("Models trained and saved to ./models (metrics suppressed in UI).")
             except Exception as e:
                 st.error(f"Training failed: {e}")
@@ -1,27 +1,31 @@
 # ml/anomalies.py
 from __future__ import annotations
 import numpy as np, pandas as pd
-from sklearn.ensemble import IsolationForest
 
 def flag_amount_anomalies(tx: pd.DataFrame) -> pd.DataFrame:
     """
-    Per-merchant, flag amount outliers (spikes/drops). Uses IsolationForest
-    when there are enough points; otherwise falls back to simple z-score.
+    Per-merchant, flag amount outliers (spikes/drops). Uses a robust modified
+    z-score (median/MAD) when there are enough points; otherwise falls back to
+    simple z-score. All merchants are scored in one vectorized groupby pass.
     """
-    parts = []
-    for m, g in tx.groupby("merchant_norm"):
-        gg = g.copy()
-        X = gg["amount"].abs().to_numpy().reshape(-1,1)
-        if len(gg) >= 6:
-            iso = IsolationForest(n_estimators=200, contamination="auto", random_state=42)
-            pred = iso.fit_predict(X)  # -1 = anomaly
-            gg["amount_anomaly"] = (pred == -1).astype(int)
-        else:
-            mu = X.mean(); sd = X.std() if X.std() > 0 else 1.0
-            z = (X - mu) / sd
-            gg["amount_anomaly"] = (np.abs(z) >= 3).astype(int)
-        parts.append(gg)
-    return pd.concat(parts, ignore_index=True) if parts else tx
+    if tx.empty:
+        return tx
+    amt = tx["amount"].abs()
+    keys = tx["merchant_norm"]
+    g = amt.groupby(keys)
+    n = g.transform("size").to_numpy()
+
+    dev = (amt - g.transform("median")).abs()
+    mad = dev.groupby(keys).transform("median")
+    robust = (0.6745 * dev / (mad + 1e-9)).to_numpy() >= 3.5
+
+    sd = g.transform("std", ddof=0)
+    sd = sd.where(sd > 0, 1.0)
+    z = ((amt - g.transform("mean")).abs() / sd).to_numpy() >= 3
+
+    # One flag array aligned to tx's rows; the input frame is never copied or regrouped
+    flags = np.where(n >= 6, robust, z).astype(int)
+    return tx.assign(amount_anomaly=flags)
 
 def flag_missed_cycles(subs: pd.DataFrame) -> pd.DataFrame:
     """
@@ -32,11 +36,9 @@ def flag_missed_cycles(subs: pd.DataFrame) -> pd.DataFrame:
         return subs
     subs = subs.copy()
     map_days = {"weekly":7, "biweekly":14, "monthly":30, "quarterly":90, "yearly":365}
-    def missed(row):
-        if not row["is_subscription"] or not row["last_date"] or not row["cadence"]:
-            return 0
-        d = pd.to_datetime(row["last_date"])
-        days = map_days.get(row["cadence"], 30)
-        return int(pd.Timestamp.today().normalize() > d + pd.Timedelta(days=int(1.5*days)))
-    subs["missed_cycle"] = subs.apply(missed, axis=1)
+    days = (1.5 * subs["cadence"].map(map_days).fillna(30)).astype(int)
+    due = pd.to_datetime(subs["last_date"]) + pd.to_timedelta(days, unit="D")
+    overdue = pd.Timestamp.today().normalize() > due  # NaT compares False
+    active = subs["is_subscription"].astype(bool) & subs["last_date"].notna() & subs["cadence"].notna()
+    subs["missed_cycle"] = (active & overdue).astype(int)
     return subs
@@ -1,4 +1,11 @@
 # ml/brands.py
+"""
+Brand lexicon: canonical brand names, their categories and alias regexes.
+
+BRAND_PATTERN tags a description with the brand whose alias matches leftmost
+in the text; two brands matching at the same position go to RAW_RULES order.
+(Before the union pattern, the first rule in RAW_RULES matching anywhere won.)
+"""
 from __future__ import annotations
 import re
 from dataclasses import dataclass
@@ -163,3 +170,35 @@ BRAND_RULES: List[BrandRule] = [
     BrandRule(name, category, rx(aliases))
     for (name, category, aliases) in RAW_RULES
 ]
+
+# Single union pattern over all rules, one named group per rule (g0..gK), so a
+# description needs one regex search instead of one per rule. Every alias starts
+# with \b; factoring it out lets the engine skip non-boundary positions cheaply.
+# The leftmost brand in the text wins; ties at the same spot go to RAW_RULES order.
+assert all(a.startswith(r"\b") for _, _, aliases in RAW_RULES for a in aliases)
+BRAND_PATTERN: Pattern[str] = re.compile(
+    r"\b(?:" + "|".join(
+        f"(?P<g{i}>{'|'.join(a[2:] for a in aliases)})"
+        for i, (_, _, aliases) in enumerate(RAW_RULES)
+    ) + ")",
+    re.IGNORECASE,
+)
+
+def _required_literal(alias: str) -> str:
+    # Longest plain-text run every match of alias must contain: escapes, char
+    # classes, (groups) and optional/repeated chars are treated as gaps.
+    s = re.sub(r"\\.|\[[^\]]*\]", " ", alias)
+    while re.search(r"\([^()]*\)", s):
+        s = re.sub(r"\([^()]*\)", " ", s)
+    s = re.sub(r".[?*]|\+", " ", s)
+    runs = s.split() if "|" not in s else []
+    return max(runs, key=len) if runs else ""
+
+# Cheap literal prefilter over the raw text. It shares BRAND_PATTERN's
+# re.IGNORECASE, so both case-fold alike (e.g. "ſ" matches "s" in both) and a
+# description that fails it cannot match BRAND_PATTERN. An alias without a
+# usable literal contributes "", which makes the prefilter pass everything —
+# safe, just slower.
+BRAND_PREFILTER: Pattern[str] = re.compile("|".join(sorted(
+    {re.escape(_required_literal(a)) for _, _, aliases in RAW_RULES for a in aliases}
+)), re.IGNORECASE)
@@ -0,0 +1,34 @@
+# ml/calibration.py
+from __future__ import annotations
+import numpy as np
+from sklearn.isotonic import IsotonicRegression
+
+class OOBCalibratedForest:
+    """
+    A RandomForestClassifier fitted with oob_score=True, with its positive-class
+    probability passed through an isotonic map fitted on the forest's own
+    out-of-bag scores. The forest keeps every training row, yet the calibrator
+    only sees scores from trees that never saw the row. Offers classes_,
+    predict_proba and predict like the CalibratedClassifierCV it stands in for.
+    """
+
+    def __init__(self, forest):
+        self.forest = forest
+        self.classes_ = forest.classes_
+
+    def fit(self, y) -> "OOBCalibratedForest":
+        if len(self.classes_) != 2:
+            raise ValueError("OOB calibration supports binary forests only.")
+        oob = self.forest.oob_decision_function_[:, 1]
+        target = (np.asarray(y) == self.classes_[1]).astype(float)
+        self.calibrator = IsotonicRegression(out_of_bounds="clip").fit(oob, target)
+        # Calibrated OOB scores double as honest train-set scores (no extra forest pass)
+        self.oob_proba_ = self.calibrator.predict(oob)
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.calibrator.predict(self.forest.predict_proba(X)[:, 1])
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
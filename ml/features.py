@@ -1,7 +1,8 @@
 # ml/features.py
 from __future__ import annotations
+import re
 import numpy as np, pandas as pd
-from typing import Dict
+import pyarrow as pa
 
 HINTS = {"subscription","subs","member","membership","premium","plus","plan","autopay","auto pay","renewal"}
 
@@ -13,62 +14,22 @@ NEG_WORDS = {
 
 CADENCES = [("weekly",7,1), ("biweekly",14,2), ("monthly",30,3), ("quarterly",90,7), ("yearly",365,15)]
 
-def _cadence_label(med_gap: float) -> str | None:
-    for label, base, wiggle in CADENCES:
-        if abs(med_gap - base) <= wiggle or (label=="monthly" and 28<=med_gap<=31):
-            return label
-    return None
+_HINT_RE = re.compile("|".join(map(re.escape, HINTS)))
+_NEG_RE = re.compile("|".join(map(re.escape, NEG_WORDS)))
 
-def _cadence_flags(label: str | None) -> Dict[str,int]:
-    return {
-        "is_weekly": int(label=="weekly"),
-        "is_biweekly": int(label=="biweekly"),
-        "is_monthly": int(label=="monthly"),
-        "is_quarterly": int(label=="quarterly"),
-        "is_yearly": int(label=="yearly"),
-    }
+_CAD_LABELS = np.array([c[0] for c in CADENCES], dtype=object)
+_CAD_BASES = np.array([c[1] for c in CADENCES], dtype=float)
+_CAD_WIGGLES = np.array([c[2] for c in CADENCES], dtype=float)
+_CAD_MIDS = (_CAD_BASES[:-1] + _CAD_BASES[1:]) / 2  # nearest-base bin edges
 
-def group_features(group: pd.DataFrame) -> dict:
-    g = group.copy()
-    g["date"] = pd.to_datetime(g["date"])
-    dates = g["date"].sort_values()
-    gaps = dates.diff().dt.days.dropna().to_numpy()
-    med_gap = float(np.median(gaps)) if gaps.size else 0.0
-    gap_std = float(np.std(gaps)) if gaps.size else 0.0
-    cad = _cadence_label(med_gap)
-
-    amounts = g["amount"].astype(float)
-    abs_amt  = amounts.abs()
-    mean_amt = float(abs_amt.mean()) if len(abs_amt) else 0.0
-    std_amt  = float(abs_amt.std(ddof=0)) if len(abs_amt) else 0.0
-    cv       = (std_amt / (mean_amt + 1e-9)) if mean_amt > 0 else 999.0
-
-    count    = int(len(g))
-    span_days= int((dates.max()-dates.min()).days) if len(dates)>1 else 0
-    debit_ratio = float((amounts < 0).mean()) if len(amounts) else 0.0
-
-    desc_blob = " ".join(g["description"].astype(str)).lower()
-    hint_flag = int(any(w in desc_blob for w in HINTS))
-    brand_hit = int(g["brand"].notna().any())
-
-    merchant = str(g["merchant_norm"].iloc[0] or "").lower()
-    neg_name_flag = int(any(w in merchant for w in NEG_WORDS))
-
-    flags = _cadence_flags(cad)
-    return {
-        "merchant_norm": g["merchant_norm"].iloc[0],
-        "brand_hit": brand_hit,
-        "hint_flag": hint_flag,
-        "neg_name_flag": neg_name_flag,
-        "count": count,
-        "span_days": span_days,
-        "med_gap": med_gap,
-        "gap_std": gap_std,
-        "mean_amt": mean_amt,
-        "cv": cv,
-        "debit_ratio": debit_ratio,
-        **flags,
-    }
+def _cadence_labels(med_gap: np.ndarray) -> np.ndarray:
+    """Vectorized cadence label per median gap (None when no cadence fits)."""
+    g = np.asarray(med_gap, dtype=float)
+    i = np.searchsorted(_CAD_MIDS, g)  # index of the nearest base cadence
+    ok = np.abs(g - _CAD_BASES[i]) <= _CAD_WIGGLES[i]
+    labels = np.where(ok, _CAD_LABELS[i], None)
+    labels[(g >= 28) & (g <= 31)] = "monthly"
+    return labels
 
 FEATURES = [
     "brand_hit","hint_flag","neg_name_flag",
@@ -77,6 +38,75 @@ FEATURES = [
     "is_weekly","is_biweekly","is_monthly","is_quarterly","is_yearly",
 ]
 
+def _first_codes(values: pd.Series) -> tuple[pa.Array, np.ndarray]:
+    """Factorize a string column into Arrow int codes (nulls masked) plus its uniques."""
+    codes, uniques = pd.factorize(values)
+    return pa.array(codes, mask=codes < 0), np.asarray(uniques, dtype=object)
+
 def build_feature_table(tx: pd.DataFrame) -> pd.DataFrame:
-    feats = [group_features(g) for _, g in tx.groupby("merchant_norm")]
-    return pd.DataFrame(feats)
+    """
+    One row of features per merchant_norm. The per-merchant aggregates run as
+    a single Arrow hash aggregation over integer merchant keys; only the gap
+    median stays in pandas. Besides FEATURES it carries display stats
+    (brand_first, category_first) so scorers never need to regroup.
+    """
+    df = tx.assign(date=pd.to_datetime(tx["date"]), amount=tx["amount"].astype(float))
+    df = df[df["merchant_norm"].notna()].sort_values(["merchant_norm", "date"], kind="stable")
+    # Sorted by merchant, so each merchant is a run and its key is the run number
+    names = df["merchant_norm"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])[:len(names)]
+    key = np.zeros(len(names), dtype=np.int64)
+    key[starts[1:]] = 1
+    key = np.cumsum(key)
+    dates = df["date"].to_numpy(dtype="datetime64[ns]")
+    gap = np.empty(len(dates))
+    gap[1:] = np.diff(dates) // np.timedelta64(1, "D")
+    gap[starts] = np.nan
+    amount = df["amount"].to_numpy()
+    # Hint scan once per distinct description, then OR-reduced per merchant below
+    desc = df["description"].astype(str)
+    hint = {d: bool(_HINT_RE.search(d.lower())) for d in desc.unique()}
+    brand, brands = _first_codes(df["brand"])
+    category, categories = _first_codes(df["category"])
+
+    t = pa.table({
+        "key": key, "abs_amt": np.abs(amount), "gap": pa.array(gap, mask=np.isnan(gap)),
+        "ns": dates.astype(np.int64), "is_debit": amount < 0,
+        "has_hint": desc.map(hint).to_numpy(dtype=bool), "brand": brand, "category": category,
+    })
+    # Single-threaded so "first" is well defined; groups then come out in key order
+    agg = t.group_by("key", use_threads=False).aggregate([
+        ("abs_amt","mean"), ("abs_amt","stddev"), ("gap","stddev"), ("key","count"),
+        ("ns","min"), ("ns","max"), ("is_debit","mean"), ("has_hint","any"),
+        ("brand","first"), ("category","first"),
+    ])
+    col = lambda name: agg[name].to_numpy(zero_copy_only=False)
+    # Arrow has no exact grouped median, so this one stays a pandas reduction
+    med_gap = pd.Series(gap).groupby(key).median().fillna(0.0).to_numpy()
+    mean_amt = col("abs_amt_mean")
+    std_amt = col("abs_amt_stddev")
+    merchant = pd.Series(names[starts]).astype(str).str.lower()
+    cad = _cadence_labels(med_gap)
+    # first skips nulls, so a merchant has a brand hit exactly when brand_first is set
+    brand_code = agg["brand_first"].fill_null(-1).to_numpy()
+    category_code = agg["category_first"].fill_null(-1).to_numpy()
+
+    out = pd.DataFrame({
+        "merchant_norm": names[starts],
+        "brand_hit": (brand_code >= 0).astype(int),
+        "hint_flag": col("has_hint_any").astype(int),
+        "neg_name_flag": merchant.str.contains(_NEG_RE).astype(int).to_numpy(),
+        "count": col("key_count"),
+        "span_days": (col("ns_max") - col("ns_min")) // 86_400_000_000_000,
+        "med_gap": med_gap,
+        "gap_std": agg["gap_stddev"].fill_null(0.0).to_numpy(),
+        "mean_amt": mean_amt,
+        "cv": np.where(mean_amt > 0, std_amt / (mean_amt + 1e-9), 999.0),
+        "debit_ratio": col("is_debit_mean"),
+        # Code -1 (no non-null value) hits the trailing None
+        "brand_first": np.r_[brands, None][brand_code],
+        "category_first": np.r_[categories, None][category_code],
+    })
+    for label, _, _ in CADENCES:
+        out[f"is_{label}"] = (cad == label).astype(int)
+    return out
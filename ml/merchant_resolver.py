@@ -1,50 +1,89 @@
 # ml/merchant_resolver.py
 from __future__ import annotations
 import re
+from collections import defaultdict
+import numpy as np
 import pandas as pd
 from rapidfuzz import fuzz
-from .brands import BRAND_RULES
+from rapidfuzz.process import cdist
+from .brands import BRAND_RULES, BRAND_PATTERN, BRAND_PREFILTER
 
 STOPWORDS = {"inc","llc","ltd","co","corp","the","online","payment","purchase",
              "autopay","subscription","renewal","services","service"}
 
+# Per-rule lookup tables aligned with BRAND_PATTERN's g0..gK groups
+_BRAND_GROUPS = [f"g{i}" for i in range(len(BRAND_RULES))]
+_BRAND_NAMES = np.array([r.name for r in BRAND_RULES], dtype=object)
+_BRAND_CATS = np.array([r.category for r in BRAND_RULES], dtype=object)
+
+_URL_RE = re.compile(r"http[s]?://\S+")
+_DIGITS_RE = re.compile(r"\d+")
+_NON_ALPHA_RE = re.compile(r"[^a-z\s]")
+
 def normalize_merchant(text: str) -> str:
     t = (text or "").lower()
-    t = re.sub(r"http[s]?://\S+"," ", t)
-    t = re.sub(r"\d+"," ", t)
-    t = re.sub(r"[^a-z\s]"," ", t)
+    t = _URL_RE.sub(" ", t)
+    t = _DIGITS_RE.sub(" ", t)
+    t = _NON_ALPHA_RE.sub(" ", t)
     toks = [w for w in t.split() if w and w not in STOPWORDS]
     return " ".join(toks)[:80].strip()
 
 def soft_group(df: pd.DataFrame, threshold: int = 88) -> pd.DataFrame:
     df = df.copy()
-    df["merchant_norm"] = df["description"].apply(normalize_merchant)
-    uniq = df["merchant_norm"].dropna().unique().tolist()
+    # Statements repeat descriptions a lot; normalize each distinct one once
+    norm = {d: normalize_merchant(d) for d in df["description"].unique()}
+    df["merchant_norm"] = df["description"].map(norm)
+    # Greedy pass in first-seen order: each unclaimed name absorbs all later
+    # unclaimed look-alikes, scored against them in one C-level cdist row.
+    names = [u for u in df["merchant_norm"].dropna().unique() if u]
+    toks = [set(u.split()) for u in names]
+    # Blocking that never drops a real match: names sharing a token may score
+    # anything, but with no shared token token_set_ratio is an Indel ratio of the
+    # token strings, capped at 200*min(len)/(len_a+len_b) — so skip pairs whose
+    # lengths alone keep them under threshold.
+    lens = np.array([len(" ".join(t)) for t in toks], dtype=float)
+    by_token = defaultdict(list)
+    for i, t in enumerate(toks):
+        for w in t:
+            by_token[w].append(i)
+    taken = np.zeros(len(names), dtype=bool)
     mapping = {}
-    for i, u in enumerate(uniq):
-        if not u or u in mapping: 
+    for i, u in enumerate(names):
+        if taken[i]:
+            continue
+        taken[i] = True
+        cand = 200 * np.minimum(lens, lens[i]) >= (threshold - 1e-6) * (lens + lens[i])
+        for w in toks[i]:
+            cand[by_token[w]] = True
+        cand[:i+1] = False
+        idx = np.flatnonzero(cand & ~taken)
+        if not idx.size:
             continue
-        mapping[u] = u
-        for v in uniq[i+1:]:
-            if not v or v in mapping: 
-                continue
-            if fuzz.token_set_ratio(u, v) >= threshold:
-                mapping[v] = u
+        scores = cdist([u], [names[j] for j in idx], scorer=fuzz.token_set_ratio, score_cutoff=threshold)[0]
+        hit = idx[scores >= threshold]
+        taken[hit] = True
+        for j in hit:
+            mapping[names[j]] = u
     df["merchant_norm"] = df["merchant_norm"].map(lambda x: mapping.get(x, x))
     return df
 
 def apply_brand_lexicon(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    brands, cats = [], []
-    for desc in df["description"].astype(str):
-        hit_b, hit_c = None, None
-        for rule in BRAND_RULES:
-            if rule.pattern.search(desc):
-                hit_b, hit_c = rule.name, rule.category
-                break
-        brands.append(hit_b); cats.append(hit_c)
-    df["brand"] = brands
-    df["category"] = cats
+    # Statements repeat descriptions a lot; match each distinct one once and
+    # broadcast the result back through the factorized codes.
+    codes, uniq = pd.factorize(df["description"].astype(str))
+    desc = pd.Series(uniq, dtype=object)
+    # Most descriptions name no brand; only rows passing the literal prefilter
+    # pay for the full union-regex extract.
+    cand = desc.str.contains(BRAND_PREFILTER).to_numpy()
+    hits = np.zeros((len(desc), len(BRAND_RULES)), dtype=bool)
+    hits[cand] = desc[cand].str.extract(BRAND_PATTERN)[_BRAND_GROUPS].notna().to_numpy()
+    any_hit = hits.any(axis=1)
+    first = hits.argmax(axis=1)
+    brand = np.where(any_hit, _BRAND_NAMES[first], None)
+    category = np.where(any_hit, _BRAND_CATS[first], None)
+    df["brand"] = brand[codes]
+    df["category"] = category[codes]
     df["brand_hit"] = df["brand"].notna().astype(int)
     return df
 
@@ -4,8 +4,27 @@ from PIL import Image
 import pdfplumber
 import os
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# 200 DPI keeps 9pt statement text legible while rendering ~2.25x fewer
+# pixels than 300; LSTM-only + single text block roughly halves tesseract time.
+OCR_DPI = 200
+TESSERACT_CONFIG = "--oem 1 --psm 6"
+
+def _ocr_image(img) -> str:
+    return pytesseract.image_to_string(img, config=TESSERACT_CONFIG)
+
+def _page_runs(indices):
+    """Group sorted 0-based page indices into contiguous (first, last) runs."""
+    runs = []
+    for i in indices:
+        if runs and i == runs[-1][1] + 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return runs
+
 def extract_text_from_file(path):
     """
     Extract text from a file.
@@ -17,26 +36,54 @@ def extract_text_from_file(path):
     text = ""
 
     if ext == ".pdf":
-        # Try text-based extraction first
+        # Text-based extraction per page; pages without a text layer are
+        # OCR'd individually so digital pages are never rasterized.
+        page_texts = None
         try:
             with pdfplumber.open(path) as pdf:
-                for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        text += extracted + "\n"
+                page_texts = [page.extract_text() or "" for page in pdf.pages]
         except Exception as e:
             print("pdfplumber failed:", e)
 
-        # If empty, fallback to OCR
-        if not text.strip():
+        if page_texts is None:
+            scanned = None  # unreadable by pdfplumber: OCR the whole document
+        else:
+            scanned = [i for i, t in enumerate(page_texts) if not t.strip()]
+            if len(scanned) == len(page_texts):
+                scanned = None  # fully image-only: one whole-document rasterization
+
+        if scanned is None or scanned:
             print("Falling back to OCR...")
-            pages = convert_from_path(path, 300)
-            for page in pages:
-                text += pytesseract.image_to_string(page)
+            # Poppler rasterizes pages on its own threads; mono text loses nothing in grayscale
+            raster = dict(
+                dpi=OCR_DPI, thread_count=os.cpu_count() or 1,
+                use_pdftocairo=True, grayscale=True,
+            )
+            if scanned is None:
+                pages = convert_from_path(path, **raster)
+            else:
+                # One call per contiguous run of scanned pages keeps poppler's
+                # threads busy across the run instead of one page at a time
+                pages = [
+                    img
+                    for first, last in _page_runs(scanned)
+                    for img in convert_from_path(path, first_page=first + 1, last_page=last + 1, **raster)
+                ]
+            # Each page is OCR'd by its own tesseract subprocess, so threads
+            # run them in parallel without pickling page images.
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+                ocr_texts = list(pool.map(_ocr_image, pages))
+            if scanned is None:
+                page_texts = ocr_texts
+            else:
+                for i, t in zip(scanned, ocr_texts):
+                    page_texts[i] = t
+
+        text = "".join(t + "\n" for t in page_texts if t)
 
     elif ext in [".png", ".jpg", ".jpeg"]:
         img = Image.open(path)
-        text = pytesseract.image_to_string(img)
+        text = _ocr_image(img)
 
     else:
         raise ValueError(f"Unsupported file type: {ext}")
@@ -1,101 +1,136 @@
 # ml/parse_transactions.py
 from __future__ import annotations
 import re
-from typing import List, Dict
+from datetime import date
+from pathlib import Path
+from typing import List
 from dateutil.parser import parse as dtparse
+import numpy as np
 import pandas as pd
 
 DATE_PAT = re.compile(
-    r"\b("
-    r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}"                                # 01/12/2025 or 1-2-25
+    r"\b(?:"
+    r"(?P<mdy>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})"                                 # 01/12/2025 or 1-2-25
     r"|"
-    r"\d{4}[./-]\d{1,2}[./-]\d{1,2}"                                 # 2025-01-12 or 2025.1.12
+    r"(?P<ymd>\d{4}[./-]\d{1,2}[./-]\d{1,2})"                                 # 2025-01-12 or 2025.1.12
     r"|"
-    r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*"     # Jan, January, Aug, August
-    r"[ -]\d{1,2},?[ -]?\d{2,4}"                                     # Jan 12, 2025  OR Jan-12 2025
+    r"(?P<mdy_name>(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*"   # Jan, January, Aug, August
+    r"[ -]\d{1,2},?[ -]?\d{2,4})"                                              # Jan 12, 2025  OR Jan-12 2025
     r"|"
-    r"\d{1,2}[ -](?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*[ -]\d{2,4}"  # 02 Aug 2025  OR 02-Aug-2025
+    r"(?P<dmy_name>\d{1,2}[ -](?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*[ -]\d{2,4})"  # 02 Aug 2025  OR 02-Aug-2025
     r")\b",
     re.IGNORECASE
 )
 
+_DATE_SEP = re.compile(r"[\s/.,-]+")
+_MONTH_NAMES = ["january","february","march","april","may","june","july",
+                "august","september","october","november","december"]
+_MONTHS = {**{n: i for i, n in enumerate(_MONTH_NAMES, 1)},
+           **{n[:3]: i for i, n in enumerate(_MONTH_NAMES, 1)}}
+
+HEADER_KEYWORDS = {
+    "account holder", "account number", "statement period", "statement date",
+    "date description", "amount ($)", "opening balance", "closing balance",
+    "page", "subtotal", "total", "summary"
+}
+HEADER_PAT = re.compile("|".join(map(re.escape, sorted(HEADER_KEYWORDS))), re.IGNORECASE)
+
 AMOUNT_PAT = re.compile(
-    r"(?P<sign>[-+])?\s*(?:USD|US\$|\$)?\s*(?P<val>\d{1,3}(?:,\d{3})*(?:\.\d{1,2})|\d+(?:\.\d{1,2})?)\b"
+    r"(?P<sign>[-+])?\s*(?P<cur>USD|US\$|\$)?\s*(?P<val>\d{1,3}(?:,\d{3})*(?:\.\d{1,2})|\d+(?:\.\d{1,2})?)\b"
 )
 
-def _to_float(num_str: str, sign: str | None) -> float:
-    v = float(num_str.replace(",", ""))
-    return -v if sign == "-" else v
+def _parse_date(m: re.Match) -> date:
+    """
+    Build the date straight from the DATE_PAT shape that matched. Anything
+    not unambiguous with a 4-digit year (2-digit years, day/month swaps,
+    odd month spellings) goes through dateutil as before.
+    """
+    parts = _DATE_SEP.split(m.group(0))
+    try:
+        if m.lastgroup == "ymd":
+            y, mo, d = parts
+        elif m.lastgroup == "mdy":
+            mo, d, y = parts
+        elif m.lastgroup == "mdy_name":
+            mo, d, y = parts
+            mo = _MONTHS[mo.lower()]
+        else:
+            d, mo, y = parts
+            mo = _MONTHS[mo.lower()]
+        if len(y) != 4:
+            raise ValueError(y)
+        return date(int(y), int(mo), int(d))
+    except (KeyError, ValueError):
+        return dtparse(m.group(0), dayfirst=False, yearfirst=False).date()
 
 def parse_text_to_transactions(text: str) -> pd.DataFrame:
     """
     Heuristic line parser: needs a date and a money-looking amount on the same line.
     Skips common header/footer lines.
     """
-    HEADER_KEYWORDS = {
-        "account holder", "account number", "statement period", "statement date",
-        "date description", "amount ($)", "opening balance", "closing balance",
-        "page", "subtotal", "total", "summary"
-    }
-
-    def is_header_line(ln: str) -> bool:
-        low = ln.lower()
-        return any(k in low for k in HEADER_KEYWORDS)
-
-    def is_money_token(token: str) -> bool:
-        # Accept if it has a currency symbol/label OR a decimal point.
-        t = token.strip().lower()
-        return ("$" in t or "usd" in t or "." in t)
-
-    records: List[Dict] = []
-    for ln in (l.strip() for l in (text or "").splitlines()):
-        if not ln:
-            continue
-        if is_header_line(ln):
-            continue
-
-        dm = DATE_PAT.search(ln)
-        if not dm:
-            continue
-
-        # Keep only "money-looking" amounts
-        raw_amount_hits = list(AMOUNT_PAT.finditer(ln))
-        ams = [m for m in raw_amount_hits if is_money_token(m.group(0))]
-        if not ams:
-            continue
-
-        last = ams[-1]
-        amt = _to_float(last.group("val"), last.group("sign"))
-
-        # Extra guard: ignore absurd magnitudes from noise (tweak as needed)
-        if abs(amt) > 1_000_000:
-            continue
-
+    # Line filtering (blank / header / no date) runs column-wise over all lines;
+    # only the surviving candidates go through the span-based extraction below.
+    lines = pd.Series((text or "").splitlines(), dtype=object).str.strip()
+    lines = lines[(lines != "") & ~lines.str.contains(HEADER_PAT)]
+    date_hits = lines.map(DATE_PAT.search)
+    has_date = date_hits.notna()
+
+    rows = []
+    for ln, dm in zip(lines[has_date], date_hits[has_date]):
+        # Keep only "money-looking" amounts (currency label or a decimal point);
+        # the last one on the line wins
+        last = None
+        for m in AMOUNT_PAT.finditer(ln):
+            if m.group("cur") or "." in m.group("val"):
+                last = m
+        if last is not None:
+            rows.append((ln, dm, last))
+
+    # Amount conversion, sign and magnitude guard run over the whole column
+    vals = pd.Series([m.group("val") for _, _, m in rows], dtype=object)
+    amounts = vals.str.replace(",", "", regex=False).astype(float).to_numpy()
+    negative = np.array([m.group("sign") == "-" for _, _, m in rows], dtype=bool)
+    amounts = np.where(negative, -amounts, amounts)
+    # Extra guard: ignore absurd magnitudes from noise (tweak as needed)
+    sane = np.abs(amounts) <= 1_000_000
+
+    dates: List[date] = []; descs: List[str] = []; keep: List[int] = []
+    for i in np.flatnonzero(sane):
+        ln, dm, last = rows[i]
         try:
-            d = dtparse(dm.group(0), dayfirst=False, yearfirst=False).date()
+            d = _parse_date(dm)
         except Exception:
             continue
 
         s, e = last.span()
         desc = (ln[:dm.start()] + ln[dm.end():s] + ln[e:]).strip(" -:|•\t")
-        if not desc:
-            desc = "Transaction"
-
-        records.append({
-            "date": d,
-            "description": desc,
-            "amount": amt,
-            "currency": "USD",
-            "type": "debit" if amt < 0 else "credit"
-        })
-
-    df = pd.DataFrame.from_records(records, columns=["date","description","amount","currency","type"])
+        dates.append(d); descs.append(desc or "Transaction"); keep.append(i)
+
+    amount = amounts[np.array(keep, dtype=int)]
+    df = pd.DataFrame({
+        "date": np.array(dates, dtype=object),
+        "description": np.array(descs, dtype=object),
+        "amount": amount,
+        "currency": "USD",
+        "type": np.where(amount < 0, "debit", "credit").astype(object),
+    }, columns=["date","description","amount","currency","type"])
     if not df.empty:
-        df["date"] = pd.to_datetime(df["date"]).dt.date
         df.sort_values(["date","description"], inplace=True)
         df.reset_index(drop=True, inplace=True)
     return df
 
+def parse_text_files(paths: List[str]) -> pd.DataFrame:
+    """
+    Parse .txt statements one file at a time (only one file's text in memory)
+    and stack the results. Each file comes back sorted on its own; the final
+    stable (date, description) sort restores the order parsing the joined text
+    gave when files overlap in dates, which downstream per-merchant sums follow.
+    """
+    frames = [parse_text_to_transactions(Path(p).read_text(encoding="utf-8")) for p in paths]
+    if not frames:
+        return parse_text_to_transactions("")
+    tx = pd.concat(frames, ignore_index=True)
+    return tx.sort_values(["date","description"], kind="stable").reset_index(drop=True)
 
 
 if __name__ == "__main__":
@@ -1,59 +1,148 @@
 # ml/recurring.py
 from __future__ import annotations
+import re
 import pandas as pd, numpy as np
 
 CADENCES = [("weekly",7,1), ("biweekly",14,2), ("monthly",30,3), ("quarterly",90,7), ("yearly",365,10)]
 HINTS = {"subscription","subs","member","membership","premium","plus","plan","auto pay","autopay","renewal"}
+# Blobs are lowercased before matching, so no re.I case folding is needed
+HINT_RE = re.compile("|".join(map(re.escape, sorted(HINTS, key=len, reverse=True))))
 
-def _cadence_label(med_gap: float) -> str | None:
-    for label, base, wiggle in CADENCES:
-        if abs(med_gap - base) <= wiggle or (label=="monthly" and 28<=med_gap<=31):
-            return label
-    return None
+# Indexed by cadence code; code -1 (no cadence) hits the trailing entry
+_CAD_LABELS = np.array([label for label, _, _ in CADENCES] + [None], dtype=object)
+_CAD_DAYS = np.array([base for _, base, _ in CADENCES] + [30], dtype="timedelta64[D]")
+
+def _cadence_codes(med_gap: np.ndarray) -> np.ndarray:
+    """Vectorized CADENCES index per median gap; the first matching cadence wins (-1 if none)."""
+    g = np.asarray(med_gap, dtype=float)
+    masks = [np.abs(g - base) <= wiggle for _, base, wiggle in CADENCES]
+    masks[2] |= (g >= 28) & (g <= 31)  # monthly also covers every calendar-month length
+    return np.select(masks, np.arange(len(CADENCES)), default=-1)
+
+def _segment_stats(starts: np.ndarray, dates: np.ndarray, abs_amt: np.ndarray) -> dict:
+    """
+    Per-run stats over rows sorted by (merchant, date), where run i spans
+    starts[i]:starts[i+1]. med_gap is the median day gap between consecutive
+    rows of a run (NaN for single-row runs).
+    """
+    n = len(dates)
+    if not n:
+        empty = np.zeros(0)
+        return {"med_gap": empty, "mean_amt": empty, "std_amt": empty,
+                "count": np.zeros(0, dtype=int), "last_date": dates}
+    ends = np.r_[starts[1:], n]
+    count = ends - starts
+    # reduceat sums each run sequentially rather than pairwise as Series.mean did,
+    # so results can differ from the per-merchant loop by an ulp (as in features.py)
+    x = abs_amt.astype(float)
+    mean = np.add.reduceat(x, starts) / count
+    # Same steps as pandas' std(ddof=0): summed squared deviations / n
+    sq = (np.repeat(mean, count) - x) ** 2
+    std = np.sqrt(np.add.reduceat(sq, starts) / count)
+    return {"med_gap": _segment_median_gap(starts, count, dates), "mean_amt": mean,
+            "std_amt": std, "count": count, "last_date": dates[ends - 1]}
+
+def _segment_median_gap(starts: np.ndarray, count: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    """
+    Median of the in-run day gaps for every run at once. Gaps are non-negative
+    whole days, so a single integer sort on run * span + gap orders each run's
+    gaps contiguously and the middle elements are read off by offset.
+    """
+    gap = np.diff(dates) // np.timedelta64(1, "D")
+    run = np.repeat(np.arange(len(starts)), count)[1:]
+    within = np.ones(len(gap), dtype=bool)
+    within[starts[1:] - 1] = False  # the step from one run into the next
+    gap, run = gap[within], run[within]
+    span = int(gap.max()) + 1 if len(gap) else 1
+    ordered = np.sort(run * span + gap) - run * span  # run is already non-decreasing
+    k = count - 1
+    lo = np.r_[0, np.cumsum(k)[:-1]]
+    med = np.full(len(starts), np.nan)
+    has = k > 0
+    a = ordered[lo[has] + (k[has] - 1) // 2]
+    b = ordered[lo[has] + k[has] // 2]
+    med[has] = (a + b) / 2
+    return med
+
+def _segment_first(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """First non-null value of each run (None when a run has none), like groupby first."""
+    n = len(values)
+    ends = np.r_[starts[1:], n]
+    # Position of the first valid row at or after each start; runs with none overshoot
+    idx = np.where(pd.notna(values), np.arange(n), n)
+    first = np.minimum.reduceat(idx, starts) if n else idx
+    out = np.full(len(starts), None, dtype=object)
+    hit = first < ends
+    out[hit] = values[first[hit]]
+    return out
 
 def detect_recurring_subscriptions(tx: pd.DataFrame, min_occurrences=3, max_cv=0.25) -> pd.DataFrame:
     if tx.empty:
         return pd.DataFrame(columns=["merchant_norm","brand","category","count","mean_amt","cv","cadence","last_date","next_expected","is_recurring","is_subscription"])
-    df = tx.copy(); df["date"] = pd.to_datetime(df["date"])
-
-    rows = []
-    for m, g in df.groupby("merchant_norm"):
-        g = g.sort_values("date")
-        dates = pd.to_datetime(g["date"])
-        gaps = dates.diff().dt.days.dropna().to_numpy()
-        med_gap = float(np.median(gaps)) if gaps.size else 0.0
-        cadence = _cadence_label(med_gap)
-
-        abs_amt = g["amount"].abs().astype(float)
-        mean_amt = float(abs_amt.mean()) if len(abs_amt) else 0.0
-        cv = float(abs_amt.std(ddof=0) / (mean_amt + 1e-9)) if mean_amt > 0 else 999.0
-        count = int(len(g))
-
-        has_min = count >= min_occurrences
-        stable = cv <= max_cv
-        cadence_ok = cadence in {"weekly","biweekly","monthly","yearly"}
-        is_recurring = bool(has_min and stable and cadence_ok)
-
-        desc_blob = " ".join(g["description"].astype(str)).lower()
-        hint = any(w in desc_blob for w in HINTS)
-        brand_hit = int(g["brand"].notna().any())
-        category = (g["category"].dropna().iloc[0]) if g["category"].notna().any() else None
-
-        in_amount_band = 4.0 <= mean_amt <= 250.0
-        is_subscription = bool(is_recurring and (brand_hit or hint or (in_amount_band and cadence=="monthly")))
-
-        last_date = dates.max().date() if len(dates) else None
-        days = 30
-        if cadence == "weekly": days = 7
-        elif cadence == "biweekly": days = 14
-        elif cadence == "quarterly": days = 90
-        elif cadence == "yearly": days = 365
-        next_expected = (pd.to_datetime(last_date) + pd.Timedelta(days=days)).date() if last_date else None
-
-        rows.append({
-            "merchant_norm": m, "brand": (g["brand"].dropna().iloc[0]) if brand_hit else None,
-            "category": category, "count": count, "mean_amt": round(mean_amt,2),
-            "cv": round(cv,3), "cadence": cadence, "last_date": last_date,
-            "next_expected": next_expected, "is_recurring": is_recurring, "is_subscription": is_subscription
-        })
-    return pd.DataFrame(rows).sort_values(["is_subscription","count","mean_amt"], ascending=[False,False,False]).reset_index(drop=True)
+    # Only the columns used below are carried, and date is converted only when
+    # it isn't datetime64 already; the sort below yields the one working copy.
+    df = tx[["merchant_norm","date","amount","description","brand","category"]]
+    if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df = df.assign(date=pd.to_datetime(df["date"]))
+
+    # A stable sort by merchant turns every merchant into a contiguous run in
+    # input order; one lexsort on (run, date) then date-orders every run at
+    # once, keeping same-day rows in input order.
+    df = df[df["merchant_norm"].notna()].sort_values("merchant_norm", kind="stable")
+    keys = df["merchant_norm"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])[:len(keys)]
+    run_id = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(keys)]))
+    df = df.iloc[np.lexsort((df["date"].to_numpy(dtype="datetime64[ns]"), run_id))]
+    stats = _segment_stats(starts, df["date"].to_numpy(dtype="datetime64[ns]"),
+                           df["amount"].abs().to_numpy(dtype=float))
+    if len(starts) and df["date"].dt.tz is not None:
+        # Gaps above come from the UTC instants, as Series.diff gave them; the last
+        # date is read off the local calendar, as Timestamp.date() did
+        wall = df["date"].dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+        stats["last_date"] = wall[np.r_[starts[1:], len(wall)] - 1]
+    agg = pd.DataFrame(stats, index=pd.Index(keys[starts], name="merchant_norm"))
+    for col in ("brand", "category"):
+        agg[col] = _segment_first(df[col].to_numpy(dtype=object), starts)
+    # Everything below is plain per-merchant NumPy arrays aligned to agg's rows
+    med_gap = agg["med_gap"].fillna(0.0).to_numpy()
+    codes = _cadence_codes(med_gap)
+    cadence = _CAD_LABELS[codes]
+
+    mean_amt = agg["mean_amt"].fillna(0.0).to_numpy()
+    cv = np.where(mean_amt > 0, agg["std_amt"].to_numpy() / (mean_amt + 1e-9), 999.0)
+    count = agg["count"].to_numpy(dtype=np.int64)
+
+    has_min = count >= min_occurrences
+    stable = cv <= max_cv
+    cadence_ok = np.isin(cadence, ["weekly","biweekly","monthly","yearly"])
+    is_recurring = has_min & stable & cadence_ok
+
+    # Hints only matter for recurring merchants (most have too few rows or no
+    # cadence), so only their runs are joined; lowercasing and the scan run in Arrow
+    desc = df["description"].astype(str).to_numpy(dtype=object)
+    ends = np.r_[starts[1:], len(desc)]
+    rec = np.flatnonzero(is_recurring)
+    hint = np.zeros(len(agg), dtype=bool)
+    if len(rec):
+        blobs = pd.Series([" ".join(desc[s:e]) for s, e in zip(starts[rec], ends[rec])], dtype="string[pyarrow]")
+        hint[rec] = blobs.str.lower().str.contains(HINT_RE).to_numpy(dtype=bool)
+    brand = agg["brand"].to_numpy()
+    category = agg["category"].to_numpy()
+    brand_hit = agg["brand"].notna().to_numpy()
+
+    in_amount_band = (mean_amt >= 4.0) & (mean_amt <= 250.0)
+    is_subscription = is_recurring & (brand_hit | hint | (in_amount_band & (cadence == "monthly")))
+
+    # Whole-column datetime64[D] arithmetic; astype(object) yields datetime.date values
+    last_day = agg["last_date"].to_numpy().astype("datetime64[D]")
+    next_expected = (last_day + _CAD_DAYS[codes]).astype(object)
+
+    out = pd.DataFrame({
+        "merchant_norm": agg.index.to_numpy(), "brand": np.where(brand_hit, brand, None),
+        "category": np.where(pd.notna(category), category, None), "count": count,
+        # Python's round() is correctly rounded in decimal; np.round is not (7.215 -> 7.22)
+        "mean_amt": [round(v, 2) for v in mean_amt.tolist()], "cv": [round(v, 3) for v in cv.tolist()], "cadence": cadence,
+        "last_date": last_day.astype(object), "next_expected": next_expected,
+        "is_recurring": is_recurring, "is_subscription": is_subscription,
+    })
+    return out.sort_values(["is_subscription","count","mean_amt"], ascending=[False,False,False]).reset_index(drop=True)
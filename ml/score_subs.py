@@ -1,8 +1,13 @@
 # ml/score_subs.py
 from __future__ import annotations
-import os, json, re
+import os, json, re, threading
+from collections import OrderedDict
 import joblib
+import numpy as np
 import pandas as pd
+import pyarrow as pa, pyarrow.compute as pc
+from sklearn.ensemble import RandomForestClassifier
+from .calibration import OOBCalibratedForest
 from .features import FEATURES, build_feature_table
 from .merchant_resolver import resolve_merchants
 
@@ -14,7 +19,74 @@ BLOCK_WORDS = [
     "chevron", "7-eleven", "7eleven", "costco", "aldi",
     "kroger", "tesco", "carrefour", "spar"
 ]
-BLOCK_PATTERN = re.compile("|".join(map(re.escape, BLOCK_WORDS)), re.I)
+# Matched against lowercased names, so no Unicode case folding is needed
+BLOCK_PATTERN = re.compile("|".join(map(re.escape, BLOCK_WORDS)), re.ASCII)
+# The same alternation as source for Arrow's RE2 kernel (escaped literals mean the same in both)
+_BLOCK_RE2 = BLOCK_PATTERN.pattern
+# The scorer is shared across sessions (st.cache_resource); LRU-cap its name cache
+BLOCK_CACHE_SIZE = 10_000
+
+
+class _FlatForest:
+    """
+    A fitted binary RandomForestClassifier packed into flat node arrays. All
+    trees x rows are walked together with one vectorized step per tree level,
+    instead of one Python-dispatched predict call per tree.
+    """
+
+    def __init__(self, forest):
+        trees = [est.tree_ for est in forest.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+        left, right, feature, threshold, value = [], [], [], [], []
+        for off, t in zip(offsets, trees):
+            ids = np.arange(t.node_count)
+            leaf = t.children_left == -1
+            # Leaves point at themselves, so finished walks stay put
+            left.append(np.where(leaf, ids, t.children_left) + off)
+            right.append(np.where(leaf, ids, t.children_right) + off)
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(t.threshold)
+            v = t.value[:, 0, :]
+            value.append(v[:, 1] / v.sum(axis=1))
+        self.roots = offsets
+        self.left, self.right = np.concatenate(left), np.concatenate(right)
+        self.feature, self.threshold = np.concatenate(feature), np.concatenate(threshold)
+        self.value = np.concatenate(value)
+        self.depth = max(t.max_depth for t in trees)
+
+    def predict_pos(self, X: np.ndarray) -> np.ndarray:
+        """Positive-class probability, matching forest.predict_proba(X)[:, 1]."""
+        n, n_feat = X.shape
+        flat = X.ravel()
+        node = np.repeat(self.roots, n)
+        row = np.tile(np.arange(n) * n_feat, len(self.roots))
+        for _ in range(self.depth):
+            go_left = flat[row + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        # Tree-by-tree accumulation, as sklearn averages them
+        return self.value[node].reshape(len(self.roots), n).sum(axis=0) / len(self.roots)
+
+
+def _compile_predictor(model):
+    """
+    Return X -> positive-class probability. Random forests (bare, OOB-calibrated
+    or inside a CalibratedClassifierCV) get the flat-array walk; anything else,
+    e.g. XGBoost, keeps its own predict_proba.
+    """
+    if isinstance(model, RandomForestClassifier) and model.n_classes_ == 2:
+        return _FlatForest(model).predict_pos
+    if isinstance(model, OOBCalibratedForest) and isinstance(model.forest, RandomForestClassifier):
+        forest, cal = _FlatForest(model.forest), model.calibrator
+        return lambda X: cal.predict(forest.predict_pos(X))
+    calibrated = getattr(model, "calibrated_classifiers_", None)
+    if (calibrated and len(model.classes_) == 2
+            and all(isinstance(c.estimator, RandomForestClassifier) for c in calibrated)):
+        parts = [(_FlatForest(c.estimator), c.calibrators[0]) for c in calibrated]
+        def predict_pos(X):
+            # CalibratedClassifierCV averages each fold's calibrated positive proba
+            return sum(cal.predict(forest.predict_pos(X)) for forest, cal in parts) / len(parts)
+        return predict_pos
+    return lambda X: model.predict_proba(X)[:, 1]
 
 
 class SubscriptionScorer:
@@ -31,7 +103,12 @@ class SubscriptionScorer:
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model not found: {model_path}")
         self.model = joblib.load(model_path)
+        self._predict_pos = _compile_predictor(self.model)
         self.threshold = float(threshold)
+        # merchant_norm -> matches BLOCK_PATTERN, least recently used first; the lock guards
+        # it across the Streamlit script threads that share this scorer
+        self._block_cache: OrderedDict[str, bool] = OrderedDict()
+        self._block_lock = threading.Lock()
 
         # Determine feature list used by the trained model
         self.meta_features = None
@@ -48,42 +125,47 @@ class SubscriptionScorer:
             # Fallback to runtime FEATURES (only safe if model was trained with same list)
             self.meta_features = FEATURES
 
-    def _align_features(self, feat_df: pd.DataFrame) -> pd.DataFrame:
-        # Add any missing features as zeros; drop extras; order exactly as in training
-        for col in self.meta_features:
-            if col not in feat_df.columns:
-                feat_df[col] = 0.0
-        return feat_df[self.meta_features].copy()
+    def _align_features(self, feat_df: pd.DataFrame) -> np.ndarray:
+        # Add any missing features as zeros; drop extras; order exactly as in training.
+        # Tree models split on float32 internally, so hand them a contiguous float32 matrix.
+        X = feat_df.reindex(columns=self.meta_features, fill_value=0.0)
+        return np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+
+    def _is_blocked(self, merchants: pd.Series) -> pd.Series:
+        names = merchants.unique()
+        cache = self._block_cache
+        with self._block_lock:
+            hits = {m: cache[m] for m in names if m in cache}
+        new = [m for m in names if m not in hits]
+        if new:
+            # One batched RE2 scan (Arrow's DFA regex kernel) over all unseen names
+            lowered = pc.utf8_lower(pa.array(new, type=pa.string()))
+            hits.update(zip(new, pc.match_substring_regex(lowered, _BLOCK_RE2).to_pylist()))
+        with self._block_lock:
+            for m in names:
+                cache[m] = hits[m]
+                cache.move_to_end(m)
+            while len(cache) > BLOCK_CACHE_SIZE:
+                cache.popitem(last=False)
+        # Mapped from this call's own lookups, so a concurrent eviction can't leave a gap
+        return merchants.map(hits)
 
     def score(self, tx: pd.DataFrame) -> pd.DataFrame:
         # 1) Normalize merchants + build features
-        tx2 = resolve_merchants(tx)
-        feat = build_feature_table(tx2)
+        feat = build_feature_table(resolve_merchants(tx))
 
         # 2) Predict probabilities with aligned feature matrix
         X = self._align_features(feat)
-        probs = self.model.predict_proba(X.values)[:, 1]
+        probs = self._predict_pos(X)
         feat = feat.assign(prob=probs, is_subscription=(probs >= self.threshold).astype(int))
 
-        # 3) Attach group stats for display (count/mean_amt/brand/category)
-        add = (
-            tx2.groupby("merchant_norm")
-               .agg(
-                   brand=("brand", "first"),
-                   category=("category", "first"),
-                   count=("merchant_norm", "size"),
-                   mean_amt=("amount", lambda s: float(abs(s).mean())),
-               )
-               .reset_index()
-        )
-
-        # Keep evidence columns for post-filter; drop dup numeric cols before merge
-        keep_cols = ["merchant_norm", "prob", "is_subscription", "brand_hit", "hint_flag", "neg_name_flag"]
-        feat_for_merge = feat[keep_cols]
-        out = feat_for_merge.merge(add, on="merchant_norm", how="left")
+        # 3) Display stats (count/mean_amt/brand/category) come straight off the feature table
+        keep_cols = ["merchant_norm", "prob", "is_subscription", "brand_hit", "hint_flag", "neg_name_flag",
+                     "brand_first", "category_first", "count", "mean_amt"]
+        out = feat[keep_cols].rename(columns={"brand_first": "brand", "category_first": "category"})
 
         # ---- Safety post-filter: block common retail-like names w/o positive evidence ----
-        block_retail = out["merchant_norm"].fillna("").str.contains(BLOCK_PATTERN)
+        block_retail = self._is_blocked(out["merchant_norm"].fillna(""))
         has_positive = (out["brand"].notna()) | (out["brand_hit"] == 1) | (out["hint_flag"] == 1)
         mask = block_retail & (~has_positive)
 
@@ -4,8 +4,8 @@ import os, json, joblib
 import numpy as np, pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.calibration import CalibratedClassifierCV
 from xgboost import XGBClassifier
+from .calibration import OOBCalibratedForest
 from .features import FEATURES, build_feature_table
 from .weak_labels import weak_label
 from .merchant_resolver import resolve_merchants
@@ -38,11 +38,16 @@ def train_from_transactions(tx: pd.DataFrame, out_dir="models") -> None:
         max_depth=None,
         min_samples_leaf=1,
         class_weight="balanced",
+        oob_score=True,
         random_state=42,
         n_jobs=-1
     )
-    rf = CalibratedClassifierCV(rf_base, method="isotonic", cv=3)
-    rf.fit(Xtr, ytr)
+    # Fit once on the whole training split and fit the isotonic calibrator on the
+    # forest's out-of-bag scores, so no rows are held back from the trees and none
+    # are refit per cv fold. Isotonic (not sigmoid) keeps the 1.0 plateau the
+    # app's rf threshold of 1 relies on.
+    rf_base.fit(Xtr, ytr)
+    rf = OOBCalibratedForest(rf_base).fit(ytr)
 
     # --- XGBoost with imbalance weight ---
     pos = (ytr==1).sum(); neg = (ytr==0).sum()
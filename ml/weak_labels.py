@@ -7,7 +7,8 @@ NEGATIVE_MERCHANTS = [
     "gas","fuel","station","walmart","target","mcdonald","grocery","store","supermarket",
     "liquor","shell","chevron","7-eleven","7eleven","costco","aldi","kroger","tesco","carrefour","spar"
 ]
-NEG_TOKENS = re.compile("|".join(map(re.escape, NEGATIVE_MERCHANTS)), re.I)
+# Matched against lowercased names, so no Unicode case folding is needed
+NEG_TOKENS = re.compile("|".join(map(re.escape, NEGATIVE_MERCHANTS)), re.ASCII)
 
 def weak_label(feat: pd.DataFrame) -> pd.Series:
     """
@@ -27,7 +28,7 @@ def weak_label(feat: pd.DataFrame) -> pd.Series:
         & (feat["count"]>=2) & (feat["cv"]<=0.35)
     )
 
-    mnorm = feat["merchant_norm"].fillna("")
+    mnorm = feat["merchant_norm"].fillna("").str.lower()
     not_retailish = ~mnorm.str.contains(NEG_TOKENS)
 
     label = (reasonable_amt & (yearly | cyclic) & positive & not_retailish)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.anomalies import flag_amount_anomalies
+
+def reference_anomalies(tx: pd.DataFrame) -> np.ndarray:
+    """One merchant at a time: robust MAD score from 6 rows up, plain z-score below."""
+    flags = np.zeros(len(tx), dtype=int)
+    for _, idx in tx.groupby("merchant_norm").indices.items():
+        x = tx["amount"].abs().to_numpy()[idx]
+        if len(x) >= 6:
+            dev = np.abs(x - np.median(x))
+            flags[idx] = 0.6745 * dev / (np.median(dev) + 1e-9) >= 3.5
+        else:
+            sd = x.std() or 1.0
+            flags[idx] = np.abs(x - x.mean()) / sd >= 3
+    return flags
+
+def random_transactions(seed: int, n: int = 2000) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Merchant sizes span both sides of the 6-row switch
+    m = np.array([f"merchant {i}" for i in range(400)], dtype=object)[rng.integers(0, 400, n)]
+    m[rng.random(n) < 0.02] = None  # unresolved rows are never flagged
+    amounts = rng.choice([9.99, 15.49, 120.0], n) * np.where(rng.random(n) < 0.05, rng.uniform(3, 20, n), 1.0)
+    return pd.DataFrame({"merchant_norm": m, "amount": -np.round(amounts, 2)})
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_per_merchant_reference(seed):
+    tx = random_transactions(seed)
+    got = flag_amount_anomalies(tx)
+    assert got["amount_anomaly"].tolist() == reference_anomalies(tx).tolist()
+    assert got["amount_anomaly"].any()
+    assert got.drop(columns="amount_anomaly").equals(tx)
+
+def test_small_merchant_uses_z_score():
+    # Five rows: the MAD of the four equal amounts is 0, so only the z path leaves them unflagged
+    tx = pd.DataFrame({"merchant_norm": ["gym"] * 5, "amount": [-30.0, -30.0, -30.0, -30.0, -300.0]})
+    assert flag_amount_anomalies(tx)["amount_anomaly"].tolist() == [0, 0, 0, 0, 0]
+    tx = pd.DataFrame({"merchant_norm": ["gym"] * 6, "amount": [-30.0] * 5 + [-300.0]})
+    assert flag_amount_anomalies(tx)["amount_anomaly"].tolist() == [0, 0, 0, 0, 0, 1]
@@ -0,0 +1,26 @@
+import glob
+from pathlib import Path
+
+import pandas as pd
+
+from ml.brands import BRAND_PATTERN, BRAND_PREFILTER, BRAND_RULES, RAW_RULES
+from ml.merchant_resolver import resolve_merchants
+
+STATEMENTS = sorted(glob.glob(str(Path(__file__).resolve().parents[1] / "synthetic_data" / "*.csv")))
+
+def descriptions() -> list[str]:
+    desc = pd.concat([pd.read_csv(p)["description"] for p in STATEMENTS[:3]]).astype(str).tolist()
+    # Characters re.IGNORECASE folds but str.lower() leaves alone
+    folded = [d.replace("s", "\u017f").replace("k", "\u212a") for d in desc]
+    return desc + folded + [name.upper() for name, _, _ in RAW_RULES]
+
+def test_prefilter_never_drops_a_brand_match():
+    for d in descriptions():
+        assert BRAND_PREFILTER.search(d) or not BRAND_PATTERN.search(d), d
+
+def test_brand_matches_first_rule_at_the_leftmost_match():
+    desc = descriptions()
+    got = resolve_merchants(pd.DataFrame({"description": desc}))["brand"]
+    for d, brand in zip(desc, got):
+        hits = [(m.start(), i) for i, r in enumerate(BRAND_RULES) if (m := r.pattern.search(d))]
+        assert (brand if pd.notna(brand) else None) == (BRAND_RULES[min(hits)[1]].name if hits else None), d
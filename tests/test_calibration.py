@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from ml.calibration import OOBCalibratedForest
+from ml.score_subs import _compile_predictor
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * rng.normal(size=400) > 0).astype(int)
+    return X, y
+
+@pytest.fixture(scope="module")
+def calibrated(data):
+    X, y = data
+    forest = RandomForestClassifier(n_estimators=100, oob_score=True, random_state=0).fit(X[:300], y[:300])
+    return OOBCalibratedForest(forest).fit(y[:300])
+
+def test_oob_proba_is_the_calibrated_oob_score(calibrated):
+    oob = calibrated.forest.oob_decision_function_[:, 1]
+    np.testing.assert_array_equal(calibrated.oob_proba_, calibrated.calibrator.predict(oob))
+    assert calibrated.oob_proba_.min() >= 0 and calibrated.oob_proba_.max() <= 1
+
+def test_predict_agrees_with_predict_proba(calibrated, data):
+    X = data[0][300:]
+    proba = calibrated.predict_proba(X)
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+    assert calibrated.predict(X).tolist() == calibrated.classes_[(proba[:, 1] > 0.5).astype(int)].tolist()
+
+def test_flat_predictor_matches_predict_proba(calibrated, data):
+    X = data[0][300:]
+    np.testing.assert_allclose(_compile_predictor(calibrated)(X), calibrated.predict_proba(X)[:, 1], rtol=0, atol=1e-12)
+
+def test_rejects_multiclass_forest(data):
+    X, y = data
+    forest = RandomForestClassifier(n_estimators=20, oob_score=True, random_state=0).fit(X, y + (X[:, 1] > 1))
+    with pytest.raises(ValueError):
+        OOBCalibratedForest(forest).fit(y)
@@ -0,0 +1,27 @@
+from ml.parse_transactions import parse_text_files, parse_text_to_transactions
+
+STATEMENTS = [
+    "01-Jan-2025 Netflix 15.49\n03-Jan-2025 Coffee Shop 4.50\n10-Feb-2025 Netflix 15.49",
+    # Overlaps the first file's dates, including a same-day, same-description row
+    "02-Jan-2025 Grocery Store 52.10\n03-Jan-2025 Coffee Shop 4.50\n05-Jan-2025 Spotify 9.99",
+    "Date Description Amount ($)\n",  # header only: parses to no rows
+]
+
+def write_statements(tmp_path):
+    paths = []
+    for i, text in enumerate(STATEMENTS):
+        p = tmp_path / f"statement_{i}.txt"
+        p.write_text(text, encoding="utf-8")
+        paths.append(str(p))
+    return paths
+
+def test_matches_parsing_the_joined_text(tmp_path):
+    joined = parse_text_to_transactions("\n".join(STATEMENTS))
+    got = parse_text_files(write_statements(tmp_path))
+    assert len(got) == 6
+    assert got.equals(joined)
+
+def test_no_paths_gives_the_empty_frame():
+    got = parse_text_files([])
+    assert got.empty
+    assert got.columns.tolist() == ["date", "description", "amount", "currency", "type"]
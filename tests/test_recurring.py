@@ -0,0 +1,86 @@
+import glob
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.merchant_resolver import resolve_merchants
+from ml.recurring import CADENCES, HINTS, detect_recurring_subscriptions
+
+STATEMENTS = sorted(glob.glob(str(Path(__file__).resolve().parents[1] / "synthetic_data" / "*.csv")))
+
+def reference_recurring(tx: pd.DataFrame, min_occurrences=3, max_cv=0.25) -> pd.DataFrame:
+    """The original one-merchant-at-a-time loop, with mean_amt and cv left unrounded."""
+    df = tx.assign(date=pd.to_datetime(tx["date"]))
+    rows = []
+    for m, g in df.groupby("merchant_norm"):
+        g = g.sort_values("date", kind="stable")
+        gaps = g["date"].diff().dt.days.dropna().to_numpy()
+        med_gap = float(np.median(gaps)) if gaps.size else 0.0
+        cadence = next((label for label, base, wiggle in CADENCES
+                        if abs(med_gap - base) <= wiggle or (label == "monthly" and 28 <= med_gap <= 31)), None)
+        abs_amt = g["amount"].abs().astype(float)
+        mean_amt = float(abs_amt.mean())
+        cv = float(abs_amt.std(ddof=0) / (mean_amt + 1e-9)) if mean_amt > 0 else 999.0
+        is_recurring = bool(len(g) >= min_occurrences and cv <= max_cv
+                            and cadence in {"weekly", "biweekly", "monthly", "yearly"})
+        blob = " ".join(g["description"].astype(str)).lower()
+        brand = g["brand"].dropna()
+        category = g["category"].dropna()
+        last_date = g["date"].max().date()
+        days = dict((label, base) for label, base, _ in CADENCES).get(cadence, 30)
+        rows.append({
+            "merchant_norm": m, "brand": brand.iloc[0] if len(brand) else None,
+            "category": category.iloc[0] if len(category) else None, "count": len(g),
+            "mean_amt": mean_amt, "cv": cv, "cadence": cadence, "last_date": last_date,
+            "next_expected": (pd.Timestamp(last_date) + pd.Timedelta(days=days)).date(),
+            "is_recurring": is_recurring,
+            "is_subscription": bool(is_recurring and (len(brand) or any(w in blob for w in HINTS)
+                                                      or (4.0 <= mean_amt <= 250.0 and cadence == "monthly"))),
+        })
+    return pd.DataFrame(rows)
+
+def random_transactions(seed: int, n: int = 3000) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    merchants = np.array([f"merchant {i}" for i in range(120)], dtype=object)
+    m = merchants[rng.integers(0, len(merchants), n)]
+    m[rng.random(n) < 0.02] = None  # rows the resolver could not name are skipped
+    # Coarse dates so many merchants have several rows on one day
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 120, n) * 3, unit="D")
+    amounts = np.round(rng.choice([9.99, 15.49, 76.455, 120.0], n) * rng.choice([1, 1, 1, 1.01], n), 2)
+    return pd.DataFrame({
+        "merchant_norm": m, "date": dates, "amount": -amounts,
+        "description": np.where(rng.random(n) < 0.1, "premium plan", "card purchase"),
+        "brand": np.where(rng.random(n) < 0.05, "brand", None),
+        "category": np.where(rng.random(n) < 0.05, "category", None),
+    })
+
+def assert_matches_reference(tx: pd.DataFrame):
+    got = detect_recurring_subscriptions(tx).sort_values("merchant_norm").reset_index(drop=True)
+    ref = reference_recurring(tx).sort_values("merchant_norm").reset_index(drop=True)
+    assert got["merchant_norm"].tolist() == ref["merchant_norm"].tolist()
+    for col in ["brand", "category", "count", "cadence", "last_date", "next_expected", "is_recurring", "is_subscription"]:
+        assert got[col].tolist() == ref[col].tolist(), col
+    # Sums may differ from the loop's by an ulp, so the rounded values only have to
+    # sit within half a unit of the last kept digit of the exact ones
+    assert np.all(np.abs(got["mean_amt"] - ref["mean_amt"]) <= 0.005 + 1e-9)
+    assert np.all(np.abs(got["cv"] - ref["cv"]) <= 0.0005 + 1e-9)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_reference_on_random_transactions(seed):
+    assert_matches_reference(random_transactions(seed))
+
+@pytest.mark.parametrize("path", STATEMENTS[:3])
+def test_matches_reference_on_synthetic_statements(path):
+    assert_matches_reference(resolve_merchants(pd.read_csv(path)))
+
+def test_empty_input_keeps_columns():
+    out = detect_recurring_subscriptions(random_transactions(0).iloc[:0])
+    assert out.empty and "is_subscription" in out.columns
+
+def test_tz_aware_dates_match_reference():
+    tx = random_transactions(3)
+    # 23h past midnight UTC is the previous evening in New York, so UTC and local days differ
+    tx["date"] = (tx["date"] + pd.Timedelta(hours=23)).dt.tz_localize("UTC").dt.tz_convert("America/New_York")
+    assert_matches_reference(tx)
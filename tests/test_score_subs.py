@@ -0,0 +1,84 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import ml.score_subs as score_subs
+from ml.score_subs import BLOCK_PATTERN, SubscriptionScorer, _compile_predictor
+
+MODELS = Path(__file__).resolve().parents[1] / "models"
+
+@pytest.fixture(scope="module")
+def scorer():
+    return SubscriptionScorer(str(MODELS / "rf_subscription.pkl"), str(MODELS / "subs_meta.json"))
+
+@pytest.fixture
+def fresh_scorer(scorer):
+    scorer._block_cache.clear()
+    return scorer
+
+def expected_blocked(names):
+    return [bool(BLOCK_PATTERN.search(n.lower())) for n in names]
+
+def test_block_mask_matches_block_pattern(fresh_scorer):
+    names = ["Shell Gas", "netflix", "7-Eleven #12", "spotify", "SPAR market", "netflix"]
+    assert fresh_scorer._is_blocked(pd.Series(names)).tolist() == expected_blocked(names)
+    # The second call is served from the cache and must agree
+    assert fresh_scorer._is_blocked(pd.Series(names)).tolist() == expected_blocked(names)
+
+def test_block_cache_evicts_least_recently_used(fresh_scorer, monkeypatch):
+    monkeypatch.setattr(score_subs, "BLOCK_CACHE_SIZE", 3)
+    fresh_scorer._is_blocked(pd.Series(["a", "b", "c"]))
+    fresh_scorer._is_blocked(pd.Series(["a", "walmart"]))  # refreshes a, evicts b
+    assert list(fresh_scorer._block_cache) == ["c", "a", "walmart"]
+    # One call with more unique names than the cap still answers for all of them
+    names = ["d", "e", "f target", "g", "h"]
+    assert fresh_scorer._is_blocked(pd.Series(names)).tolist() == expected_blocked(names)
+    assert list(fresh_scorer._block_cache) == ["f target", "g", "h"]
+
+def test_block_cache_is_safe_across_threads(fresh_scorer, monkeypatch):
+    monkeypatch.setattr(score_subs, "BLOCK_CACHE_SIZE", 20)
+    errors = []
+    def work(i):
+        for k in range(100):
+            names = [f"store {i} {k}", f"name {i} {k}", "netflix"]
+            got = fresh_scorer._is_blocked(pd.Series(names)).tolist()
+            if got != [True, False, False]:
+                errors.append(got)
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(fresh_scorer._block_cache) == 20
+
+
+def feature_matrix(n_features: int, seed: int = 0, n: int = 300) -> np.ndarray:
+    # Mix of integer-like flags and skewed reals, as float32 like _align_features gives
+    rng = np.random.default_rng(seed)
+    X = rng.lognormal(2.0, 1.5, (n, n_features))
+    X[:, ::3] = rng.integers(0, 2, (n, len(range(0, n_features, 3))))
+    return X.astype(np.float32)
+
+def test_flat_forest_matches_bundled_model(scorer):
+    X = feature_matrix(len(scorer.meta_features))
+    np.testing.assert_allclose(scorer._predict_pos(X), scorer.model.predict_proba(X)[:, 1], rtol=0, atol=1e-12)
+
+@pytest.mark.parametrize("max_depth", [None, 3])
+def test_flat_forest_matches_bare_random_forest(max_depth):
+    X = feature_matrix(8, seed=1)
+    y = (X[:, 1] + X[:, 2] > np.median(X[:, 1] + X[:, 2])).astype(int)
+    rf = RandomForestClassifier(n_estimators=50, max_depth=max_depth, random_state=0).fit(X[:200], y[:200])
+    # Also rows sitting exactly on split thresholds, where <= vs < decides the branch
+    rng = np.random.default_rng(2)
+    on_split = np.empty((100, X.shape[1]), dtype=np.float32)
+    for f in range(X.shape[1]):
+        cuts = np.concatenate([t.tree_.threshold[t.tree_.feature == f] for t in rf.estimators_])
+        on_split[:, f] = rng.choice(cuts, 100) if len(cuts) else 0.0
+    X_eval = np.vstack([X[200:], on_split])
+    predict_pos = _compile_predictor(rf)
+    np.testing.assert_allclose(predict_pos(X_eval), rf.predict_proba(X_eval)[:, 1], rtol=0, atol=1e-12)
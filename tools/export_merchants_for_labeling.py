@@ -18,16 +18,10 @@ from pathlib import Path
 import pandas as pd
 
 # local imports (project structure)
-from ml.parse_transactions import parse_text_to_transactions
+from ml.parse_transactions import parse_text_files
 from ml.merchant_resolver import resolve_merchants
 from ml.features import build_feature_table
 
-def load_texts(paths: list[str]) -> str:
-    chunks = []
-    for p in paths:
-        chunks.append(Path(p).read_text(encoding="utf-8"))
-    return "\n".join(chunks)
-
 def main():
     ap = argparse.ArgumentParser(description="Export merchant table for manual labeling.")
     ap.add_argument("--txt-glob", default="synthetic_data/*.txt", help="Glob for training TXT files.")
@@ -38,8 +32,7 @@ def main():
     if not paths:
         raise SystemExit(f"No .txt found for pattern: {args.txt_glob}")
 
-    raw = load_texts(paths)
-    tx = parse_text_to_transactions(raw)
+    tx = parse_text_files(paths)
     if tx.empty:
         raise SystemExit("Parser produced 0 transactions. Check your input format.")
 
@@ -48,18 +41,16 @@ def main():
     # Build merchant-level features (for context columns)
     feat = build_feature_table(tx2)  # includes merchant_norm + cadence/amount stats
 
-    # Add useful context columns for labeling
+    # Add useful context columns for labeling (brand/category/count already come with feat)
+    # groupby.head(3) trims each merchant to its first rows in C before the small joins
+    samples = tx2.assign(description=tx2["description"].astype(str)).groupby("merchant_norm").head(3)
     agg = (
-        tx2.groupby("merchant_norm")
-           .agg(
-               sample_descriptions=("description", lambda s: "; ".join(list(map(str, s))[:3])),
-               brand=("brand", "first"),
-               category=("category", "first"),
-               count=("merchant_norm", "size"),
-           )
-           .reset_index()
+        samples.groupby("merchant_norm")
+               .agg(sample_descriptions=("description", "; ".join))
+               .reset_index()
     )
 
+    feat = feat.rename(columns={"brand_first": "brand", "category_first": "category"})
     df = feat.merge(agg, on="merchant_norm", how="left")
 
     # Move context columns to front, append a blank human_label column
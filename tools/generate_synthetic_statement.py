@@ -15,24 +15,32 @@ Outputs:
 
 Run:
   python tools/generate_synthetic_statement.py
+  SUBTRACKR_SEED=1234 python tools/generate_synthetic_statement.py   # reproducible
 """
 
 from __future__ import annotations
+import os
 import random
 from datetime import date, timedelta
 from pathlib import Path
-from typing import List, Tuple
+from dateutil.relativedelta import relativedelta
+from typing import Dict, List, Tuple
 import numpy as np
+from numpy.random import default_rng
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from matplotlib import font_manager
+from reportlab.lib.pagesizes import LETTER
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
 
 # ------------- CONFIG -------------
 MONTHS_BACK = 12
 OUT_DIR = Path("synthetic_data")
 ACCOUNT_HOLDER = "John Doe"
-# New random seed each run for uniqueness; set e.g. SEED=1234 to reproduce.
-SEED = random.randint(1000, 999999)
+# A new random seed is picked per run in main(); set SUBTRACKR_SEED=1234 to reproduce.
 # ----------------------------------
 
 
@@ -42,8 +50,7 @@ def fmt_date(d: date) -> str:
     return d.strftime("%d-%b-%Y")
 
 def first_day_n_months_ago(n: int) -> date:
-    today = date.today()
-    return (today - timedelta(days=30*n)).replace(day=1)
+    return (date.today() - relativedelta(months=n)).replace(day=1)
 
 # ---------- Subscription pools ----------
 # (name, typical_amount, cadence_label)
@@ -136,104 +143,113 @@ NOISE_MERCHANTS = [
     "Bakery","Butcher Shop","Fish Market","Garden Center","Shoe Outlet"
 ]
 
+# Noise descriptions as gather tables: refund rows pick from the suffixed copy
+NOISE_ARR = np.array(NOISE_MERCHANTS, dtype=object)
+NOISE_REFUND_ARR = np.array([m + " REFUND" for m in NOISE_MERCHANTS], dtype=object)
+
 CADENCE_TO_DAYS = {"weekly": 7, "monthly": 30, "quarterly": 90, "yearly": 365}
 
+# SUB_BRANDS_POOL as parallel columns, so picks are plain index gathers
+_NAMES = np.array([t[0] for t in SUB_BRANDS_POOL], dtype=object)
+_AMTS = np.array([t[1] for t in SUB_BRANDS_POOL], dtype=np.float64)
+_CADENCES = np.array([t[2] for t in SUB_BRANDS_POOL], dtype=object)
+_CAD_DAYS = np.array([CADENCE_TO_DAYS.get(t[2], 30) for t in SUB_BRANDS_POOL], dtype=np.int16)
+
 # ---------- Generators ----------
-def gen_subscription_rows(start_date: date, months: int, rng: random.Random) -> List[dict]:
-    """Generate recurring subscriptions with missed cycles and plan changes.
-       Debits -> NEGATIVE amounts."""
-    rows = []
+def gen_subscription_rows(start_date: date, months: int, rng: np.random.Generator,
+                          last_day: date) -> Dict[str, np.ndarray]:
+    """Generate recurring subscriptions with missed cycles and plan changes,
+       dated within [start_date, last_day]. Debits -> NEGATIVE amounts.
+       Per-cycle jitter is drawn as months-sized arrays, once per subscription.
+       Rows come back in date order."""
+    dates, descriptions, amounts = [], [], []
     # Pick 10–20 subscriptions for this synthetic user
-    chosen = rng.sample(SUB_BRANDS_POOL, k=rng.randint(10, 20))
+    sel = rng.choice(len(_NAMES), size=int(rng.integers(10, 20, endpoint=True)), replace=False)
+    window = (np.datetime64(start_date, "D"), np.datetime64(last_day, "D"))
 
-    for name, base_amt, cadence in chosen:
-        anchor = start_date.replace(day=rng.randint(3, 25))
-        cur = anchor
+    for j in sel:
+        name, base_amt, cadence = _NAMES[j], _AMTS[j], _CADENCES[j]
+        anchor = start_date.replace(day=int(rng.integers(3, 25, endpoint=True)))
 
         # missed cycles: 0–1 missed months for realism
-        missed_indices = set()
+        missed_mask = np.zeros(months, dtype=bool)
         if cadence in {"monthly", "weekly"} and rng.random() < 0.25:
-            missed_indices.add(rng.randint(0, max(0, months-1)))
+            missed_mask[rng.integers(0, max(0, months-1), endpoint=True)] = True
 
         # plan change month (bump/drop)
-        plan_change_idx = rng.randint(0, max(0, months-1)) if rng.random() < 0.35 else None
+        plan_change_idx = int(rng.integers(0, max(0, months-1), endpoint=True)) if rng.random() < 0.35 else None
         plan_delta = rng.uniform(-2.0, 5.0)
 
-        for i in range(months):
-            # advance by cadence
-            cur = cur + timedelta(days=CADENCE_TO_DAYS.get(cadence, 30))
-            # date jitter
-            jitter_low, jitter_high = (-1, 1) if cadence == "weekly" else (-3, 3)
-            charge_date = cur + timedelta(days=rng.randint(jitter_low, jitter_high))
-
-            if i in missed_indices:
-                continue
-
-            # base jitter
-            amount = base_amt + rng.uniform(-0.7, 1.2)
-            # occasional tax/fee surcharges
-            if rng.random() < 0.10:
-                amount += rng.uniform(0.5, 2.0)
-            # plan change
-            if plan_change_idx is not None and i >= plan_change_idx:
-                amount += plan_delta
-
-            # DEBIT -> NEGATIVE
-            amount = -round(max(0.99, amount), 2)
-
-            rows.append({
-                "date": charge_date,
-                "description": f"{name} Subscription",
-                "amount": amount,            # negative
-                "currency": "USD",
-                "type": "debit"
-            })
-
-    return rows
-
-def gen_noise_rows(start_date: date, months: int, rng: random.Random) -> List[dict]:
-    """Generate daily noise transactions (debits negative, credits positive)."""
-    rows = []
-    end_date = start_date + timedelta(days=30*months + 5)
-    d = start_date
-    while d <= end_date:
-        # 0–3 random purchases a day
-        for _ in range(rng.randint(0, 3)):
-            desc = rng.choice(NOISE_MERCHANTS)
-            # decide if refund/credit (positive) or purchase (negative)
-            is_refund = rng.random() < 0.08
-            magnitude = rng.uniform(5.0, 350.0) if not is_refund else rng.uniform(5.0, 150.0)
-            amount = round(magnitude, 2)
-            if is_refund:
-                desc += " REFUND"
-                sign_amount = amount       # CREDIT -> POSITIVE
-                tx_type = "credit"
-            else:
-                sign_amount = -amount      # DEBIT -> NEGATIVE
-                tx_type = "debit"
-
-            # occasional duplicate-like charges same day (same sign)
-            if rng.random() < 0.02:
-                rows.append({
-                    "date": d,
-                    "description": desc,
-                    "amount": sign_amount,
-                    "currency": "USD",
-                    "type": tx_type
-                })
-
-            rows.append({
-                "date": d,
-                "description": desc,
-                "amount": sign_amount,
-                "currency": "USD",
-                "type": tx_type
-            })
-        d += timedelta(days=1)
-    return rows
+        # advance by cadence, plus date jitter
+        jitter_low, jitter_high = (-1, 1) if cadence == "weekly" else (-3, 3)
+        jitter_days = rng.integers(jitter_low, jitter_high, size=months, endpoint=True)
+        # Monthly plans renew on the same calendar day (anchor days stop at 25,
+        # so no month clamps it); other cadences step a fixed number of days
+        cycles = np.arange(1, months + 1)
+        if cadence == "monthly":
+            cycles = (np.datetime64(anchor, "M") + cycles).astype("datetime64[D]") + (anchor.day - 1)
+        else:
+            cycles = np.datetime64(anchor, "D") + cycles * int(_CAD_DAYS[j])
+        charge_dates = cycles + jitter_days.astype("timedelta64[D]")
+
+        # base jitter, occasional tax/fee surcharges, plan change
+        amount = base_amt + rng.uniform(-0.7, 1.2, size=months)
+        tax_mask = rng.random(months) < 0.10
+        amount += np.where(tax_mask, rng.uniform(0.5, 2.0, size=months), 0.0)
+        if plan_change_idx is not None:
+            amount[plan_change_idx:] += plan_delta
+        # DEBIT -> NEGATIVE
+        amount = -np.maximum(0.99, amount).round(2)
+
+        keep = ~missed_mask & (charge_dates >= window[0]) & (charge_dates <= window[1])
+        dates.append(charge_dates[keep])
+        descriptions.append(np.full(int(keep.sum()), f"{name} Subscription", dtype=object))
+        amounts.append(amount[keep])
+
+    dates = np.concatenate(dates)
+    order = np.argsort(dates, kind="stable")
+    n = len(dates)
+    return {
+        "date": dates[order],
+        "description": np.concatenate(descriptions)[order],
+        "amount": np.concatenate(amounts)[order],
+        "currency": np.full(n, "USD", dtype=object),
+        "type": np.full(n, "debit", dtype=object),
+    }
+
+def gen_noise_rows(start_date: date, months: int, rng: np.random.Generator,
+                   last_day: date) -> Dict[str, np.ndarray]:
+    """Generate daily noise transactions up to last_day (debits negative,
+       credits positive). The whole table is drawn in a few batched Generator
+       calls and is day-ordered by construction."""
+    end_date = min(start_date + timedelta(days=30*months + 5), last_day)
+    n_days = (end_date - start_date).days + 1
+    days = np.datetime64(start_date, "D") + np.arange(n_days)
+    # 0–3 random purchases a day
+    counts = rng.integers(0, 3, size=n_days, endpoint=True)
+    total = int(counts.sum())
+
+    idx = rng.integers(0, len(NOISE_MERCHANTS), size=total)
+    # decide if refund/credit (positive) or purchase (negative)
+    is_refund = rng.random(total) < 0.08
+    magnitude = np.where(is_refund, rng.uniform(5.0, 150.0, total), rng.uniform(5.0, 350.0, total)).round(2)
+    desc = np.where(is_refund, NOISE_REFUND_ARR[idx], NOISE_ARR[idx])
+
+    # occasional duplicate-like charges same day (same sign), right next to the original
+    dup = rng.random(total) < 0.02
+    rows = np.repeat(np.arange(total), np.where(dup, 2, 1))
+    is_refund = is_refund[rows]
+    return {
+        "date": np.repeat(days, counts)[rows],
+        "description": desc[rows],
+        "amount": np.where(is_refund, magnitude[rows], -magnitude[rows]),  # CREDIT +, DEBIT -
+        "currency": np.full(len(rows), "USD", dtype=object),
+        "type": np.where(is_refund, "credit", "debit").astype(object),
+    }
 
 # ---------- Statement build & PDF ----------
-def build_statement_text(df: pd.DataFrame, acct_last4: int, first_day: date, last_day: date) -> str:
+def build_statement_text(df: pd.DataFrame, acct_last4: int, first_day: date, last_day: date) -> List[str]:
+    """Statement lines (header first); joined for the TXT, paginated as-is for the PDF."""
     header = [
         "Sample Bank Statement",
         f"Account Holder: {ACCOUNT_HOLDER}",
@@ -241,56 +257,75 @@ def build_statement_text(df: pd.DataFrame, acct_last4: int, first_day: date, las
         f"Statement Period: {fmt_date(first_day)} to {fmt_date(last_day)}",
         "Date Description Amount ($)"
     ]
-    lines = header + [f"{fmt_date(r['date'])} {r['description']} {r['amount']:.2f}"
-                      for r in df.to_dict(orient='records')]
-    return "\n".join(lines)
+    # Whole-column formatting: one strftime and one %.2f pass, then a column-wise concat
+    dates = df["date"].dt.strftime("%d-%b-%Y")
+    amounts = np.char.mod("%.2f", df["amount"].to_numpy())
+    lines = dates + " " + df["description"] + " " + amounts
+    return header + lines.tolist()
 
 def render_pdf(text_lines: List[str], pdf_path: Path):
+    """Draw the statement straight onto PDF pages as text (no figures, nothing
+       rasterized), in the DejaVu Sans Mono face the matplotlib renderer used.
+       The font ships with matplotlib and is embedded, so any Unicode
+       description renders and extracts verbatim."""
     lines_per_page = 58
     pages = [text_lines[i:i+lines_per_page] for i in range(0, len(text_lines), lines_per_page)]
-    with PdfPages(pdf_path) as pdf:
-        for i, page_lines in enumerate(pages, start=1):
-            fig = plt.figure(figsize=(8.5, 11))
-            ax = fig.add_axes([0, 0, 1, 1]); ax.axis("off")
-            y = 0.97; line_height = 0.016
-            for ln in page_lines:
-                ax.text(0.05, y, ln, family="DejaVu Sans Mono", fontsize=9, va="top")
-                y -= line_height
-            ax.text(0.5, 0.02, f"Page {i}", ha="center", va="bottom",
-                    fontsize=8, family="DejaVu Sans Mono")
-            pdf.savefig(fig, dpi=300)
-            plt.close(fig)
+    if "DejaVuSansMono" not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont("DejaVuSansMono", font_manager.findfont("DejaVu Sans Mono")))
+    width, height = LETTER
+    # Same layout as the figure version: 5% margin, 9pt lines 1.6% of the page apart;
+    # the first baseline sits one ~7pt ascent below where va="top" hung the text
+    x, top, leading = 0.05 * width, 0.97 * height - 7, 0.016 * height
+    c = canvas.Canvas(str(pdf_path), pagesize=LETTER)
+    for i, page_lines in enumerate(pages, start=1):
+        body = c.beginText(x, top)
+        body.setFont("DejaVuSansMono", 9, leading)
+        body.textLines(page_lines)
+        c.drawText(body)
+        c.setFont("DejaVuSansMono", 8)
+        c.drawCentredString(width / 2, 0.02 * height, f"Page {i}")
+        c.showPage()
+    c.save()
 
 # ---------- Main ----------
 def main():
-    rng = random.Random(SEED)
-    np.random.seed(SEED)
+    seed = os.getenv("SUBTRACKR_SEED")
+    seed = random.SystemRandom().randint(1000, 999999) if seed is None else int(seed)
+    rng = default_rng(seed)
 
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
     first_day = first_day_n_months_ago(MONTHS_BACK)
     last_day = date.today()
 
-    subs = gen_subscription_rows(first_day, MONTHS_BACK, rng)
-    noise = gen_noise_rows(first_day, MONTHS_BACK, rng)
-
-    df = pd.DataFrame(subs + noise).sort_values("date").reset_index(drop=True)
-    # Keep within window
-    df = df[(df["date"] >= first_day) & (df["date"] <= last_day)].reset_index(drop=True)
-
-    acct_last4 = rng.randint(1000, 9999)
-    statement_text = build_statement_text(df, acct_last4, first_day, last_day)
-
-    txt_path = OUT_DIR / f"synthetic_statement_{SEED}_6mo.txt"
-    csv_path = OUT_DIR / f"synthetic_statement_{SEED}_6mo.csv"
-    pdf_path = OUT_DIR / f"synthetic_statement_{SEED}_6mo.pdf"
-
-    txt_path.write_text(statement_text, encoding="utf-8")
-    df_out = df.copy(); df_out["date"] = df_out["date"].astype(str)
-    df_out.to_csv(csv_path, index=False)
-    render_pdf(statement_text.splitlines(), pdf_path)
-
-    print(f"[✅] Seed: {SEED}")
+    # Each generator gets its own child stream, so neither one's draws shift
+    # the other's output. Both only emit rows inside [first_day, last_day].
+    rng_subs, rng_noise = rng.spawn(2)
+    subs = gen_subscription_rows(first_day, MONTHS_BACK, rng_subs, last_day)
+    noise = gen_noise_rows(first_day, MONTHS_BACK, rng_noise, last_day)
+
+    # Both inputs are already date-ordered, so the stable argsort (timsort on
+    # int64 dates) just merges the two runs in linear time
+    order = np.argsort(np.concatenate([subs["date"], noise["date"]]), kind="stable")
+    df = pd.DataFrame({k: np.concatenate([subs[k], noise[k]])[order] for k in subs})
+    # One currency and two types: keep them dictionary-encoded (the CSV writes them as plain strings)
+    df = df.astype({"currency": "category", "type": "category"})
+
+    acct_last4 = int(rng.integers(1000, 9999, endpoint=True))
+    statement_lines = build_statement_text(df, acct_last4, first_day, last_day)
+
+    txt_path = OUT_DIR / f"synthetic_statement_{seed}_6mo.txt"
+    csv_path = OUT_DIR / f"synthetic_statement_{seed}_6mo.csv"
+    pdf_path = OUT_DIR / f"synthetic_statement_{seed}_6mo.pdf"
+
+    txt_path.write_text("\n".join(statement_lines), encoding="utf-8")
+    # Arrow writes the CSV in C and serializes date32 natively as YYYY-MM-DD
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.set_column(table.schema.get_field_index("date"), "date", table["date"].cast(pa.date32()))
+    pacsv.write_csv(table, str(csv_path))
+    render_pdf(statement_lines, pdf_path)
+
+    print(f"[✅] Seed: {seed}")
     print(f"[ok] TXT -> {txt_path}")
     print(f"[ok] CSV -> {csv_path}")
     print(f"[ok] PDF -> {pdf_path}")